@@ -13,30 +13,20 @@ import pandas as pd
 import numpy as np
 from collections import Counter
 
+def canonical_race_ml(labels):
+    """Sort multi-label tokens so e.g. "A|B" and "B|A" compare equal"""
+    return labels.astype(str).str.split('|').map(lambda xs: '|'.join(sorted(xs)))
+
 def calculate_agreement(manual, heuristic, column):
     """Calculate agreement rate for a specific column"""
+    valid = manual.notna() & heuristic.notna()
+    if valid.sum() == 0:
+        return 0
     if column == 'race_ml':
-        # For race, consider multi-label variations
-        agreements = 0
-        total = 0
-        for m, h in zip(manual, heuristic):
-            if pd.notna(m) and pd.notna(h):
-                total += 1
-                # Exact match
-                if m == h:
-                    agreements += 1
-                # Partial match for multi-label (e.g., "A|B" vs "B|A")
-                elif '|' in str(m) and '|' in str(h):
-                    m_set = set(str(m).split('|'))
-                    h_set = set(str(h).split('|'))
-                    if m_set == h_set:
-                        agreements += 1
-        return agreements / total if total > 0 else 0
+        # For race, consider multi-label variations (e.g., "A|B" vs "B|A")
+        return (canonical_race_ml(manual[valid]) == canonical_race_ml(heuristic[valid])).mean()
     else:
         # For other columns, simple exact match
-        valid = manual.notna() & heuristic.notna()
-        if valid.sum() == 0:
-            return 0
         return (manual[valid] == heuristic[valid]).mean()
 
 def main():
@@ -55,14 +45,16 @@ def main():
     # Load full V3 dataset (with heuristic values)
     v3_full = pd.read_csv("Data/labels_v3.csv")
     
-    # Merge on image_id to compare
-    comparison = manual_df.merge(
-        v3_full[['image_id', 'race_ml', 'ambiguous_mixed', 'unknown_uncertain', 
-                 'conf_race', 'conf_gender', 'conf_skin', 'skin_tone_bin', 'cultural_markers']],
-        on='image_id',
-        suffixes=('_manual', '_heuristic'),
+    # Join on image_id to compare (index join avoids re-hashing the right frame)
+    heuristic = v3_full.set_index('image_id')[
+        ['race_ml', 'ambiguous_mixed', 'unknown_uncertain',
+         'conf_race', 'conf_gender', 'conf_skin', 'skin_tone_bin', 'cultural_markers']]
+    comparison = manual_df.set_index('image_id').join(
+        heuristic,
+        lsuffix='_manual',
+        rsuffix='_heuristic',
         how='left'
-    )
+    ).reset_index()
     
     print(f"\n✅ Loaded {len(manual_df)} manual annotations")
     print(f"✅ Matched with heuristic predictions")
@@ -3,20 +3,30 @@ Comparative Analysis: V1 → V2 → V3 Evolution
 Shows how each version improves fairness and ethical representation
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # headless: figures are only saved to PNG
 import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import Counter
+from v3_data import load_v3
 
 # Load all three versions
 print("="*80)
 print("LOADING DATASETS...")
 print("="*80)
 
-v1 = pd.read_csv("Data/labels_v1.csv")
-v2 = pd.read_csv("Data/labels_v2_balanced.csv")
-v3 = pd.read_csv("Data/labels_v3.csv")
+# Demographic columns have a tiny fixed vocabulary; load them as categoricals
+LABEL_DTYPES = {"race_cat": "category", "gender_cat": "category"}
+
+# V1/V2 only contribute their demographic columns; read just the header for the feature list
+LABEL_COLS = list(LABEL_DTYPES)
+v1_columns = list(pd.read_csv("Data/labels_v1.csv", nrows=0).columns)
+v2_columns = list(pd.read_csv("Data/labels_v2_balanced.csv", nrows=0).columns)
+
+v1 = pd.read_csv("Data/labels_v1.csv", usecols=LABEL_COLS, dtype=LABEL_DTYPES)
+v2 = pd.read_csv("Data/labels_v2_balanced.csv", usecols=LABEL_COLS, dtype=LABEL_DTYPES)
+v3 = load_v3()
 
 print(f"\nV1 (Original):     {len(v1)} images")
 print(f"V2 (Balanced):     {len(v2)} images")
@@ -30,14 +40,20 @@ print("\n" + "="*80)
 print("SECTION 1: DATASET COMPOSITION & BALANCE")
 print("="*80)
 
+def category_counts(df, col):
+    """Per-label counts of a column via np.bincount on its category codes"""
+    codes = df[col].astype('category').cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0])
+    return counts[counts > 0]
+
 def calculate_balance_score(df, col='race_cat'):
     """Calculate how balanced a dataset is (1.0 = perfect balance, 0.0 = worst)"""
-    counts = df[col].value_counts()
+    counts = category_counts(df, col)
     expected = len(df) / len(counts)
     # Chi-square-like deviation
-    deviations = [(count - expected)**2 / expected for count in counts]
+    deviations = (counts - expected)**2 / expected
     max_deviation = len(df) * (len(counts) - 1)
-    balance = 1 - (sum(deviations) / max_deviation)
+    balance = 1 - (deviations.sum() / max_deviation)
     return balance
 
 print("\n📊 RACE DISTRIBUTION:")
@@ -45,19 +61,22 @@ print("\nV1 (Original):")
 v1_race = v1['race_cat'].value_counts()
 for race, count in v1_race.items():
     print(f"  {race:20s}: {count:4d} ({count/len(v1)*100:5.1f}%)")
-print(f"  Balance Score: {calculate_balance_score(v1, 'race_cat'):.3f}")
+v1_balance = calculate_balance_score(v1, 'race_cat')
+print(f"  Balance Score: {v1_balance:.3f}")
 
 print("\nV2 (Balanced):")
 v2_race = v2['race_cat'].value_counts()
 for race, count in v2_race.items():
     print(f"  {race:20s}: {count:4d} ({count/len(v2)*100:5.1f}%)")
-print(f"  Balance Score: {calculate_balance_score(v2, 'race_cat'):.3f}")
+v2_balance = calculate_balance_score(v2, 'race_cat')
+print(f"  Balance Score: {v2_balance:.3f}")
 
 print("\nV3 (Ethical - base categories):")
 v3_race = v3['race_cat'].value_counts()
 for race, count in v3_race.items():
     print(f"  {race:20s}: {count:4d} ({count/len(v3)*100:5.1f}%)")
-print(f"  Balance Score: {calculate_balance_score(v3, 'race_cat'):.3f}")
+v3_balance = calculate_balance_score(v3, 'race_cat')
+print(f"  Balance Score: {v3_balance:.3f}")
 
 print("\n📊 GENDER DISTRIBUTION:")
 print("\nV1:")
@@ -81,12 +100,13 @@ print("SECTION 2: FEATURE EVOLUTION")
 print("="*80)
 
 print("\n📋 AVAILABLE FEATURES:")
-print(f"\nV1 Columns ({len(v1.columns)}): {list(v1.columns)}")
-print(f"\nV2 Columns ({len(v2.columns)}): {list(v2.columns)}")
-print(f"\nV3 Columns ({len(v3.columns)}): {list(v3.columns)}")
+print(f"\nV1 Columns ({len(v1_columns)}): {v1_columns}")
+print(f"\nV2 Columns ({len(v2_columns)}): {v2_columns}")
+v3_columns = list(v3.columns)
+print(f"\nV3 Columns ({len(v3_columns)}): {v3_columns}")
 
 print("\n✨ NEW FEATURES IN V3:")
-v3_only = set(v3.columns) - set(v1.columns)
+v3_only = set(v3_columns) - set(v1_columns)
 for feat in sorted(v3_only):
     print(f"  • {feat}")
 
@@ -99,24 +119,26 @@ print("SECTION 3: V3 ETHICAL METADATA ADVANTAGES")
 print("="*80)
 
 print("\n🎯 MULTI-LABEL SUPPORT:")
-multi_label_count = v3['race_ml'].str.contains('\\|', na=False).sum()
+multi_label_count = v3['race_ml'].str.contains('|', regex=False, na=False).sum()
 print(f"  Images with multiple racial identities: {multi_label_count} ({multi_label_count/len(v3)*100:.1f}%)")
 print(f"  V1/V2 approach: Force into single category (information loss)")
 print(f"  V3 approach: Preserve ambiguity (more accurate representation)")
 
 print("\n❓ UNCERTAINTY QUANTIFICATION:")
-uncertain_count = v3['unknown_uncertain'].astype(float).eq(1).sum()
+uncertain_count = int(v3['unknown_uncertain'].sum())
 print(f"  Images flagged as uncertain: {uncertain_count} ({uncertain_count/len(v3)*100:.1f}%)")
 print(f"  V1/V2 approach: No uncertainty measure (false confidence)")
 print(f"  V3 approach: Explicit confidence scores (transparency)")
 
 print("\n📊 CONFIDENCE DISTRIBUTION:")
-print(f"  Race confidence:   Mean={pd.to_numeric(v3['conf_race'], errors='coerce').mean():.3f}, "
-      f"Median={pd.to_numeric(v3['conf_race'], errors='coerce').median():.3f}")
-print(f"  Gender confidence: Mean={pd.to_numeric(v3['conf_gender'], errors='coerce').mean():.3f}, "
-      f"Median={pd.to_numeric(v3['conf_gender'], errors='coerce').median():.3f}")
-print(f"  Skin confidence:   Mean={pd.to_numeric(v3['conf_skin'], errors='coerce').mean():.3f}, "
-      f"Median={pd.to_numeric(v3['conf_skin'], errors='coerce').median():.3f}")
+# Confidence columns are loaded as float64; reused for the histograms below
+conf = {c: v3[c] for c in ['conf_race', 'conf_gender', 'conf_skin']}
+print(f"  Race confidence:   Mean={conf['conf_race'].mean():.3f}, "
+      f"Median={conf['conf_race'].median():.3f}")
+print(f"  Gender confidence: Mean={conf['conf_gender'].mean():.3f}, "
+      f"Median={conf['conf_gender'].median():.3f}")
+print(f"  Skin confidence:   Mean={conf['conf_skin'].mean():.3f}, "
+      f"Median={conf['conf_skin'].median():.3f}")
 
 print("\n🌈 SKIN TONE GRANULARITY:")
 print(f"  V1/V2: No skin tone information")
@@ -141,7 +163,7 @@ print("="*80)
 
 def calculate_representation_gaps(df, col='race_cat'):
     """Calculate max representation gap (fairness measure)"""
-    counts = df[col].value_counts()
+    counts = category_counts(df, col)
     max_gap = (counts.max() - counts.min()) / len(df)
     return max_gap
 
@@ -158,13 +180,9 @@ print(f"  Improvement V2→V3: {(1-v3_gap/v2_gap)*100:.1f}% change in gap")
 
 print("\n🎯 EFFECTIVE REPRESENTATION (V3 advantage):")
 # V3 allows multi-label, so effective representation is higher
-all_races = []
-for race_ml in v3['race_ml']:
-    if pd.notna(race_ml):
-        all_races.extend(str(race_ml).split('|'))
-race_counter = Counter(all_races)
+race_counts = v3['race_ml'].dropna().astype(str).str.split('|').explode().value_counts()
 print(f"  With multi-label expansion:")
-for race, count in race_counter.most_common():
+for race, count in race_counts.items():
     print(f"    {race:20s}: {count:4d} appearances")
 
 print("\n🔍 SUBSET IDENTIFICATION CAPABILITY:")
@@ -229,31 +247,28 @@ gs = fig.add_gridspec(4, 3, hspace=0.35, wspace=0.3)
 
 # 1. Race distribution comparison
 ax1 = fig.add_subplot(gs[0, :])
-x = np.arange(len(v1_race))
 width = 0.25
-races = sorted(set(list(v1_race.index) + list(v2_race.index) + list(v3_race.index)))
-v1_counts = [v1_race.get(r, 0) for r in races]
-v2_counts = [v2_race.get(r, 0) for r in races]
-v3_counts = [v3_race.get(r, 0) for r in races]
-
-ax1.bar([i-width for i in range(len(races))], v1_counts, width, label='V1 (Original)', alpha=0.8, color='lightcoral')
-ax1.bar([i for i in range(len(races))], v2_counts, width, label='V2 (Balanced)', alpha=0.8, color='skyblue')
-ax1.bar([i+width for i in range(len(races))], v3_counts, width, label='V3 (Ethical)', alpha=0.8, color='lightgreen')
+# Align the three distributions on one race axis (missing races count as 0)
+version_race_counts = pd.concat([v1_race.rename('V1'), v2_race.rename('V2'), v3_race.rename('V3')], axis=1).fillna(0)
+version_race_counts.index = version_race_counts.index.astype(str)
+version_race_counts = version_race_counts.sort_index()
+races = version_race_counts.index.to_list()
+x = np.arange(len(races))
+
+ax1.bar(x - width, version_race_counts['V1'].to_numpy(), width, label='V1 (Original)', alpha=0.8, color='lightcoral')
+ax1.bar(x, version_race_counts['V2'].to_numpy(), width, label='V2 (Balanced)', alpha=0.8, color='skyblue')
+ax1.bar(x + width, version_race_counts['V3'].to_numpy(), width, label='V3 (Ethical)', alpha=0.8, color='lightgreen')
 ax1.set_xlabel('Race Category')
 ax1.set_ylabel('Count')
 ax1.set_title('Race Distribution Comparison: V1 vs V2 vs V3', fontweight='bold', fontsize=13)
-ax1.set_xticks(range(len(races)))
+ax1.set_xticks(x)
 ax1.set_xticklabels(races, rotation=45, ha='right')
 ax1.legend()
 ax1.grid(axis='y', alpha=0.3)
 
 # 2. Balance Score Comparison
 ax2 = fig.add_subplot(gs[1, 0])
-balance_scores = [
-    calculate_balance_score(v1),
-    calculate_balance_score(v2),
-    calculate_balance_score(v3)
-]
+balance_scores = [v1_balance, v2_balance, v3_balance]
 colors_bal = ['lightcoral', 'skyblue', 'lightgreen']
 bars = ax2.bar(['V1', 'V2', 'V3'], balance_scores, color=colors_bal, edgecolor='black', linewidth=1.5)
 ax2.set_ylabel('Balance Score')
@@ -267,7 +282,7 @@ for bar, score in zip(bars, balance_scores):
 
 # 3. Feature Count Comparison
 ax3 = fig.add_subplot(gs[1, 1])
-feature_counts = [len(v1.columns), len(v2.columns), len(v3.columns)]
+feature_counts = [len(v1_columns), len(v2_columns), len(v3_columns)]
 colors_feat = ['lightcoral', 'skyblue', 'lightgreen']
 bars = ax3.bar(['V1', 'V2', 'V3'], feature_counts, color=colors_feat, edgecolor='black', linewidth=1.5)
 ax3.set_ylabel('Number of Features')
@@ -315,11 +330,17 @@ ax6.set_title('V3: Uncertainty Quantification\n(Transparency)', fontweight='bold
 
 # 7. V3 Confidence distributions
 ax7 = fig.add_subplot(gs[2, 2])
-conf_race_clean = pd.to_numeric(v3['conf_race'], errors='coerce').dropna()
-conf_gender_clean = pd.to_numeric(v3['conf_gender'], errors='coerce').dropna()
-conf_skin_clean = pd.to_numeric(v3['conf_skin'], errors='coerce').dropna()
-ax7.hist([conf_race_clean, conf_gender_clean, conf_skin_clean], bins=15, 
-         label=['Race', 'Gender', 'Skin'], alpha=0.6, color=['coral', 'plum', 'khaki'])
+conf_clean = [conf[c].dropna().to_numpy() for c in ['conf_race', 'conf_gender', 'conf_skin']]
+# Shared bin edges over all three, then side-by-side bars within each bin (as ax.hist would draw)
+# (all-NaN columns are skipped; with no data at all the bins span 0-1)
+present = [c for c in conf_clean if c.size]
+conf_range = (min(c.min() for c in present), max(c.max() for c in present)) if present else (0, 1)
+edges = np.histogram_bin_edges([], bins=15, range=conf_range)
+bar_w = 0.8 * (edges[1] - edges[0]) / 3
+for i, (vals, label, color) in enumerate(zip(conf_clean, ['Race', 'Gender', 'Skin'], ['coral', 'plum', 'khaki'])):
+    hist, _ = np.histogram(vals, bins=edges)
+    ax7.bar(edges[:-1] + 0.1 * (edges[1] - edges[0]) + i * bar_w, hist, bar_w, align='edge',
+            label=label, alpha=0.6, color=color)
 ax7.set_xlabel('Confidence Score')
 ax7.set_ylabel('Frequency')
 ax7.set_title('V3: Confidence Distributions\n(Quality Measure)', fontweight='bold')
@@ -338,7 +359,7 @@ ax8.grid(axis='y', alpha=0.3)
 
 # 9. V3 Cultural markers
 ax9 = fig.add_subplot(gs[3, 1:])
-top_markers = v3['cultural_markers'].value_counts().head(8)
+top_markers = markers.head(8)  # counted in SECTION 3, already ranked
 ax9.barh(range(len(top_markers)), top_markers.values, color='teal', edgecolor='black')
 ax9.set_yticks(range(len(top_markers)))
 ax9.set_yticklabels(top_markers.index)
@@ -349,8 +370,12 @@ ax9.grid(axis='x', alpha=0.3)
 plt.suptitle('Dataset Evolution: V1 → V2 → V3\nFrom Basic Labeling to Ethical AI', 
              fontsize=16, fontweight='bold', y=0.995)
 
-plt.savefig('Data/v1_v2_v3_comparison.png', dpi=300, bbox_inches='tight')
-print("\n✅ Visualization saved to: Data/v1_v2_v3_comparison.png")
+# Encode the PNG on a worker thread while the summary below is printed;
+# fig is not modified after this point
+saver = ThreadPoolExecutor(max_workers=1)
+save_fut = saver.submit(fig.savefig, 'Data/v1_v2_v3_comparison.png', dpi=300, bbox_inches='tight',
+                        pil_kwargs={'compress_level': 3})
+saver.shutdown(wait=False)
 
 # ============================================================================
 # SUMMARY TABLE
@@ -375,8 +400,8 @@ summary_data = {
     ],
     'V1': [
         len(v1),
-        f"{calculate_balance_score(v1):.3f}",
-        len(v1.columns),
+        f"{v1_balance:.3f}",
+        len(v1_columns),
         f"{v1_gap*100:.1f}%",
         '❌ No',
         '❌ No',
@@ -387,8 +412,8 @@ summary_data = {
     ],
     'V2': [
         len(v2),
-        f"{calculate_balance_score(v2):.3f}",
-        len(v2.columns),
+        f"{v2_balance:.3f}",
+        len(v2_columns),
         f"{v2_gap*100:.1f}%",
         '❌ No',
         '❌ No',
@@ -399,20 +424,22 @@ summary_data = {
     ],
     'V3': [
         len(v3),
-        f"{calculate_balance_score(v3):.3f}",
-        len(v3.columns),
+        f"{v3_balance:.3f}",
+        len(v3_columns),
         f"{v3_gap*100:.1f}%",
         f'✅ Yes ({multi_label_count})',
         f'✅ Yes ({uncertain_count})',
         '✅ Yes (3 types)',
         '✅ Yes (7 bins)',
         f'✅ Yes ({len(markers)} types)',
-        f'✅ Yes ({v3["prefer_not_to_label"].astype(float).eq(1).sum()})'
+        f'✅ Yes ({int(v3["prefer_not_to_label"].sum())})'
     ]
 }
 
-summary_df = pd.DataFrame(summary_data)
-print("\n" + summary_df.to_string(index=False))
+# Fixed 10-row table: pad columns by hand rather than going through DataFrame.to_string
+rows = [list(summary_data)] + [[str(c) for c in r] for r in zip(*summary_data.values())]
+widths = [max(len(r[i]) for r in rows) for i in range(len(summary_data))]
+print("\n" + "\n".join("  ".join(c.ljust(w) for c, w in zip(r, widths)).rstrip() for r in rows))
 
 print("\n" + "="*80)
 print("CONCLUSION")
@@ -435,6 +462,9 @@ These features enable:
 V3 moves beyond demographic balancing to true ethical AI.
 """)
 
+save_fut.result()
+print("✅ Visualization saved to: Data/v1_v2_v3_comparison.png\n")
+
 print("="*80)
 print("ANALYSIS COMPLETE!")
 print("="*80)
@@ -17,9 +17,13 @@ from pathlib import Path
 MANUAL_SUBSET = "Data/v3_manual_subset.csv"
 OUTPUT_FILE = "Data/v3_manual_annotated.csv"
 
+# Only the columns this tool reports on; the rest of the subset is never read
+SUBSET_COLS = ['image_id', 'rel_path', 'race_cat', 'gender_cat', 'race_ml']
+SUBSET_DTYPES = {'race_cat': 'category', 'gender_cat': 'category'}
+
 def main():
     # Load the subset
-    df = pd.read_csv(MANUAL_SUBSET)
+    df = pd.read_csv(MANUAL_SUBSET, usecols=SUBSET_COLS, dtype=SUBSET_DTYPES)
     
     print("="*80)
     print("V3 MANUAL VALIDATION TOOL")
@@ -0,0 +1,75 @@
+"""
+Shared loader for the V3 labels file
+
+Parsing labels_v3.csv is the slowest part of the analysis scripts, so the first
+load writes a Parquet copy next to the CSV (labels_v3.cache.parquet) and later
+loads read that instead. The cache records the CSV's size and mtime and is
+rebuilt whenever either differs, or when it cannot be read.
+Without pyarrow the CSV is simply read every time.
+"""
+
+import os
+from pathlib import Path
+import pandas as pd
+
+V3_PATH = "Data/labels_v3.csv"
+
+# Compact dtypes: flags and skin bins in (nullable) Int8. Confidences stay float64:
+# in float32, 0.6 and 0.8 round up and land in the next bin of the 0.6/0.8 thresholds.
+V3_DTYPES = {
+    'race_cat': 'category',
+    'gender_cat': 'category',
+    'conf_race': 'float64',
+    'conf_gender': 'float64',
+    'conf_skin': 'float64',
+    'skin_tone_bin': 'Int8',
+    'ambiguous_mixed': 'Int8',
+    'unknown_uncertain': 'Int8',
+    'prefer_not_to_label': 'Int8',
+}
+
+def load_v3(path=V3_PATH):
+    """Load the V3 labels, preferring an up-to-date Parquet cache of the CSV"""
+    csv = Path(path)
+    parquet = csv.with_suffix('.cache.parquet')
+    st = csv.stat()
+    source = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if parquet.exists():
+        try:
+            df = pd.read_parquet(parquet)
+            # a cache of another CSV version or with older dtypes is rebuilt rather than trusted
+            if (df.attrs.get('source') == source
+                    and all(str(df[c].dtype) == t for c, t in V3_DTYPES.items() if c in df)):
+                df.attrs.clear()
+                return df
+        except Exception:
+            pass  # unreadable (e.g. truncated) cache: treat as a miss and rebuild
+
+    # Numeric columns are coerced after the read: a stray token such as '?' or
+    # 'Unknown' becomes NA instead of failing the whole load
+    df = pd.read_csv(csv, dtype={c: t for c, t in V3_DTYPES.items() if t == 'category'})
+    for col, dtype in V3_DTYPES.items():
+        if col not in df or dtype == 'category':
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        if dtype == 'Int8':
+            values = values.where((values == values.round()) & values.between(-128, 127))
+        df[col] = values.astype(dtype)
+
+    # caching is best-effort; write to a temp file so a failed write never
+    # leaves a partial cache behind
+    tmp = parquet.with_name(parquet.name + '.tmp')
+    df.attrs['source'] = source
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, parquet)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+    finally:
+        df.attrs.clear()
+    return df
+
+def top_counts(values, n):
+    """The n most frequent non-null values of a Series with their counts, same as
+    value_counts().head(n) but without sorting all distinct counts"""
+    return values.value_counts(sort=False).nlargest(n, keep='first')